@@ -1,7 +1,24 @@
+import hashlib
+import json
 import os
 import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify, render_template_string, request, send_from_directory
+from flask import Flask, Response, jsonify, render_template_string, request, send_from_directory
+
+# run.py puts src/ on sys.path; gunicorn imports this module as src.app
+try:
+    from gazetteer import get_gazetteer
+except ModuleNotFoundError as e:
+    if e.name != 'gazetteer':
+        raise
+    from src.gazetteer import get_gazetteer
+
+try:
+    from profiling import init_profiling, phase
+except ModuleNotFoundError as e:
+    if e.name != 'profiling':
+        raise
+    from src.profiling import init_profiling, phase
 
 # Load environment variables from .env file
 # This should be done early in your application's lifecycle
@@ -25,6 +42,7 @@ print("Debug: Loaded WINDY_API_TOKEN_WEBCAMS:", WINDY_API_TOKEN_WEBCAMS[:4] + ".
 # Set static_folder to the correct absolute path
 STATIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
 app = Flask(__name__, static_folder=STATIC_DIR, static_url_path='/static')
+init_profiling(app)
 
 def fetch_real_windy_data(lat=50.4, lon=14.3):
     """Fetch real weather data from Windy Point Forecast API"""
@@ -49,10 +67,12 @@ def fetch_real_windy_data(lat=50.4, lon=14.3):
         }
         
         print(f"Debug: Making Windy API request for lat={lat}, lon={lon}")
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        with phase("upstream"):
+            response = requests.post(url, json=payload, headers=headers, timeout=10)
         
         if response.status_code == 200:
-            data = response.json()
+            with phase("decode"):
+                data = response.json()
             print("Debug: Successfully fetched Windy data")
             
             # Parse the data
@@ -160,6 +180,21 @@ def get_climate_insights(weather_data):
     
     return insights
 
+# Beyond this distance the nearest bundled place says nothing useful about the location
+DESCRIBE_LOCATION_MAX_KM = 50
+
+def describe_location(lat, lon):
+    """Name the nearest bundled place, e.g. 'Near Prague, CZ', or None if none is close"""
+    try:
+        place = get_gazetteer().nearest(lat, lon)
+    except OSError as e:
+        print(f"Debug: Gazetteer unavailable: {e}")
+        return None
+    if not place or place["distance_km"] > DESCRIBE_LOCATION_MAX_KM:
+        return None
+    prefix = "" if place["distance_km"] < 5 else "Near "
+    return f"{prefix}{place['name']}, {place['country']}"
+
 def fetch_weather_data(lat=50.4, lon=14.3):
     """Fetch weather data - try real API first, fallback to placeholder"""
     # Try to get real data from Windy
@@ -182,11 +217,19 @@ def index():
     lat = request.args.get('lat', 50.4, type=float)
     lon = request.args.get('lon', 14.3, type=float)
     weather = fetch_weather_data(lat, lon)
-    climate_insights = get_climate_insights(weather) if weather else []
+    with phase("insights"):
+        climate_insights = get_climate_insights(weather) if weather else []
+    return render_index(lat, lon, weather, climate_insights)
+
+@phase("render")
+def render_index(lat, lon, weather, climate_insights):
+    """Build the portal home page HTML"""
     windy_map_url = f"https://embed.windy.com/embed2.html?lat={lat}&lon={lon}&detailLat={lat}&detailLon={lon}&width=100%25&height=500&zoom=8&level=surface&overlay=wind&product=ecmwf&menu=&message=true&marker=true&calendar=now&pressure=&type=map&location=coordinates&detail=&metricWind=default&metricTemp=default&radarRange=-1"
     if WINDY_API_TOKEN_MAP:
         windy_map_url += f"&key={WINDY_API_TOKEN_MAP}"
     insights_html = ''.join([f'<li>{insight}</li>' for insight in climate_insights])
+    place_name = describe_location(lat, lon)
+    place_html = f"<strong>{place_name}</strong> &middot; " if place_name else ""
     # To avoid f-string brace issues, use doubled braces in JS and CSS blocks
     return f"""
     <!DOCTYPE html>
@@ -339,7 +382,7 @@ def index():
         <script>
           if ('serviceWorker' in navigator) {{
             window.addEventListener('load', function() {{
-              navigator.serviceWorker.register('/static/service-worker.js');
+              navigator.serviceWorker.register('/service-worker.js');
             }});
           }}
           function sharePortal() {{
@@ -368,7 +411,7 @@ def index():
         </header>
         <main>
             <div class='container'>
-                <div class='coords'>Lat: {lat:.5f}, Lon: {lon:.5f}</div>
+                <div class='coords'>{place_html}Lat: {lat:.5f}, Lon: {lon:.5f}</div>
                 <div class='map-container'>
                     <iframe id='windy-iframe' src='{windy_map_url}' allowfullscreen title='Windy.com Weather Map'></iframe>
                 </div>
@@ -463,11 +506,13 @@ def api_weather():
     
     weather = fetch_weather_data(lat, lon)
     if weather:
-        return jsonify({
-            "status": "success",
-            "coordinates": {"latitude": lat, "longitude": lon},
-            "data": weather
-        })
+        with phase("serialize"):
+            response = jsonify({
+                "status": "success",
+                "coordinates": {"latitude": lat, "longitude": lon},
+                "data": weather
+            })
+        return response
     return jsonify({"status": "error", "message": "Could not fetch weather data"}), 500
 
 @app.route('/api/windy/point')
@@ -478,12 +523,14 @@ def api_windy_point():
     
     data = fetch_real_windy_data(lat, lon)
     if data:
-        return jsonify({
-            "status": "success",
-            "source": "Windy Point Forecast API",
-            "coordinates": {"latitude": lat, "longitude": lon},
-            "data": data
-        })
+        with phase("serialize"):
+            response = jsonify({
+                "status": "success",
+                "source": "Windy Point Forecast API",
+                "coordinates": {"latitude": lat, "longitude": lon},
+                "data": data
+            })
+        return response
     return jsonify({
         "status": "error", 
         "message": "Could not fetch data from Windy API",
@@ -498,16 +545,51 @@ def api_climate_insights():
     
     weather = fetch_weather_data(lat, lon)
     if weather:
-        insights = get_climate_insights(weather)
+        with phase("insights"):
+            insights = get_climate_insights(weather)
+        with phase("serialize"):
+            response = jsonify({
+                "status": "success",
+                "coordinates": {"latitude": lat, "longitude": lon},
+                "weather_data": weather,
+                "climate_insights": insights,
+                "timestamp": weather.get('timestamp', 'N/A'),
+                "data_source": weather.get('source', 'Unknown')
+            })
+        return response
+    return jsonify({"status": "error", "message": "Could not fetch climate data"}), 500
+
+@app.route('/api/geocode')
+def api_geocode():
+    """Offline place-name autocomplete from the bundled gazetteer (exact=1 for whole-name matches)"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    exact = request.args.get('exact', '') in ('1', 'true')
+    if not query:
+        return jsonify({"status": "error", "message": "Missing query parameter 'q'"}), 400
+
+    return jsonify({
+        "status": "success",
+        "query": query,
+        "results": get_gazetteer().search(query, limit=limit, exact=exact)
+    })
+
+@app.route('/api/reverse')
+def api_reverse():
+    """Offline nearest-place lookup from the bundled gazetteer"""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"status": "error", "message": "Valid 'lat' and 'lon' parameters are required"}), 400
+
+    place = get_gazetteer().nearest(lat, lon)
+    if place:
         return jsonify({
             "status": "success",
             "coordinates": {"latitude": lat, "longitude": lon},
-            "weather_data": weather,
-            "climate_insights": insights,
-            "timestamp": weather.get('timestamp', 'N/A'),
-            "data_source": weather.get('source', 'Unknown')
+            "place": place
         })
-    return jsonify({"status": "error", "message": "Could not fetch climate data"}), 500
+    return jsonify({"status": "error", "message": "No places available"}), 404
 
 @app.route('/tokens')
 def token_status():
@@ -539,6 +621,38 @@ def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "message": "Weather Portal is running"})
 
+# Pages the service worker precaches on install. The version hashes app.py
+# and every file under static/, so any deploy that changes a page or asset
+# gets fresh cache names and the old caches are dropped on activate.
+PRECACHE_URLS = ['/', '/static/manifest.json']
+_precache_manifest = None
+
+def build_precache_manifest():
+    """Return the versioned list of URLs for the service worker to precache"""
+    global _precache_manifest
+    if _precache_manifest is None:
+        paths = [os.path.abspath(__file__)]
+        for root, dirs, files in os.walk(STATIC_DIR):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files))
+        digest = hashlib.sha256()
+        for path in paths:
+            digest.update(os.path.relpath(path, STATIC_DIR).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _precache_manifest = {"version": digest.hexdigest()[:12], "urls": PRECACHE_URLS}
+    return _precache_manifest
+
+@app.route('/service-worker.js')
+def service_worker():
+    """Serve the service worker from the site root so its scope covers pages and /api/"""
+    with open(os.path.join(STATIC_DIR, 'service-worker.js')) as f:
+        script = f.read()
+    manifest = json.dumps(build_precache_manifest())
+    response = Response(f"self.PRECACHE_MANIFEST = {manifest};\n{script}", mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 # Serve static files for Waitress (production) if needed
 @app.route('/static/<path:filename>')
 def static_files(filename):
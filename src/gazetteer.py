@@ -0,0 +1,172 @@
+import heapq
+import math
+import mmap
+import os
+import unicodedata
+from array import array
+
+# Bundled place-name dataset. One place per line, tab separated:
+#   key, name, country, lat, lon, population
+# where `key` is the lowercased, accent-folded name. Lines are sorted by the
+# UTF-8 bytes of `key` so prefix search is a binary search over the file.
+PLACES_PATH = os.path.join(os.path.dirname(__file__), 'data', 'places.tsv')
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Letters that NFKD does not decompose into base + combining mark
+_FOLD = str.maketrans({'ł': 'l', 'Ł': 'L', 'ø': 'o', 'Ø': 'O', 'đ': 'd', 'Đ': 'D', 'ß': 'ss'})
+
+
+def normalize_name(name):
+    """Lowercase and strip accents so 'Plzeň' and 'plzen' share a key"""
+    name = unicodedata.normalize('NFKD', name.translate(_FOLD))
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(name.lower().split())
+
+
+def _to_xyz(lat, lon):
+    lat_r = math.radians(lat)
+    lon_r = math.radians(lon)
+    return (math.cos(lat_r) * math.cos(lon_r),
+            math.cos(lat_r) * math.sin(lon_r),
+            math.sin(lat_r))
+
+
+class Gazetteer:
+    """Offline place lookup over a memory-mapped, key-sorted TSV file.
+
+    The record bytes live in a read-only mmap, so every worker process maps
+    the same page-cache copy of the file. Each process only keeps two small
+    indexes: the line offsets (for prefix search) and a k-d tree over unit
+    sphere coordinates (for nearest-place lookup).
+    """
+
+    def __init__(self, path=PLACES_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._offsets = array('Q')
+        pos = 0
+        size = len(self._mm)
+        while pos < size:
+            self._offsets.append(pos)
+            end = self._mm.find(b'\n', pos)
+            pos = size if end == -1 else end + 1
+
+        self._build_spatial_index()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _line(self, i):
+        start = self._offsets[i]
+        end = self._mm.find(b'\n', start)
+        return self._mm[start:end if end != -1 else len(self._mm)]
+
+    def _key(self, i):
+        start = self._offsets[i]
+        return self._mm[start:self._mm.find(b'\t', start)]
+
+    def _record(self, i):
+        _, name, country, lat, lon, population = self._line(i).decode('utf-8').split('\t')
+        return {
+            "name": name,
+            "country": country,
+            "latitude": float(lat),
+            "longitude": float(lon),
+            "population": int(population)
+        }
+
+    def _lower_bound(self, prefix):
+        lo, hi = 0, len(self._offsets)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _population(self, i):
+        line = self._line(i)
+        return int(line[line.rindex(b'\t') + 1:])
+
+    def search(self, query, limit=10, exact=False):
+        """Return places whose name starts with (or with `exact`, equals) `query`, largest first"""
+        prefix = normalize_name(query).encode('utf-8')
+        if not prefix:
+            return []
+
+        # Keys are UTF-8, which never contains 0xff, so every key starting with
+        # `prefix` sorts below prefix + 0xff; keys equal to it sort below prefix + 0x00
+        lo = self._lower_bound(prefix)
+        hi = self._lower_bound(prefix + (b'\x00' if exact else b'\xff'))
+        rows = heapq.nlargest(limit, range(lo, hi), key=self._population)
+        return [self._record(i) for i in rows]
+
+    def _build_spatial_index(self):
+        """Build an implicit k-d tree: each subrange stores its median at the midpoint"""
+        points = []
+        for i in range(len(self._offsets)):
+            fields = self._line(i).split(b'\t')
+            points.append((_to_xyz(float(fields[3]), float(fields[4])), i))
+
+        def build(items, depth):
+            if not items:
+                return
+            axis = depth % 3
+            items.sort(key=lambda p: p[0][axis])
+            mid = len(items) // 2
+            build(items[:mid], depth + 1)
+            ordered.append(items[mid])
+            build(items[mid + 1:], depth + 1)
+
+        ordered = []
+        build(points, 0)
+        self._coords = array('d', [c for xyz, _ in ordered for c in xyz])
+        self._rows = array('L', [row for _, row in ordered])
+
+    def nearest(self, lat, lon):
+        """Return the closest place to (lat, lon) with its great-circle distance"""
+        if not self._rows:
+            return None
+        target = _to_xyz(lat, lon)
+        coords = self._coords
+        best = [float('inf'), -1]
+
+        def visit(lo, hi, depth):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            base = mid * 3
+            dx = coords[base] - target[0]
+            dy = coords[base + 1] - target[1]
+            dz = coords[base + 2] - target[2]
+            dist = dx * dx + dy * dy + dz * dz
+            if dist < best[0]:
+                best[0], best[1] = dist, mid
+
+            diff = target[depth % 3] - coords[base + depth % 3]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            visit(near[0], near[1], depth + 1)
+            if diff * diff < best[0]:
+                visit(far[0], far[1], depth + 1)
+
+        visit(0, len(self._rows), 0)
+
+        place = self._record(self._rows[best[1]])
+        chord = math.sqrt(best[0])
+        place["distance_km"] = round(2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2)), 1)
+        return place
+
+
+_gazetteer = None
+
+
+def get_gazetteer():
+    """Lazily open the bundled gazetteer once per process"""
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer()
+    return _gazetteer
@@ -0,0 +1,149 @@
+import glob
+import hmac
+import itertools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# Opt-in profiling settings. Nothing is profiled unless PROFILE_SAMPLE_RATE is
+# above zero or a request carries PROFILE_HEADER set to PROFILE_TOKEN.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0") or 0)
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'profiles')))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1") or 1)
+# Only the newest PROFILE_MAX_FILES .folded files are kept in PROFILE_DIR
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200") or 200)
+
+# Makes file names unique within a process; waitress reuses request threads
+_dump_counter = itertools.count()
+
+
+class StackSampler(threading.Thread):
+    """Periodically sample one thread's call stack into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _should_profile():
+    token = request.headers.get(PROFILE_HEADER)
+    # Compare bytes: compare_digest rejects non-ASCII str, and header values are client-controlled
+    if PROFILE_TOKEN and token and hmac.compare_digest(token.encode('utf-8'), PROFILE_TOKEN.encode('utf-8')):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+@contextmanager
+def phase(name):
+    """Time a named phase of the current request when it is being profiled"""
+    timings = g.get("profile_phases") if has_request_context() else None
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def _dump_stacks(stacks):
+    if not stacks:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}-{os.getpid()}-{next(_dump_counter)}.folded"
+    path = os.path.join(PROFILE_DIR, filename)
+    with open(path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    _prune_profiles()
+    return path
+
+
+def _prune_profiles():
+    """Delete the oldest .folded files beyond PROFILE_MAX_FILES"""
+    paths = []
+    for path in glob.glob(os.path.join(PROFILE_DIR, '*.folded')):
+        try:
+            paths.append((os.path.getmtime(path), path))
+        except OSError:
+            continue  # removed by another worker
+    paths.sort()
+    for _, path in paths[:max(0, len(paths) - PROFILE_MAX_FILES)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _stop_sampler():
+    sampler = g.pop("profile_sampler", None)
+    if sampler is None:
+        return None
+    sampler.stop()
+    return sampler
+
+
+def init_profiling(app):
+    """Register request hooks that emit Server-Timing and collapsed-stack files"""
+
+    @app.before_request
+    def start_profiling():
+        if not _should_profile():
+            return
+        g.profile_start = time.perf_counter()
+        g.profile_phases = {}
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        g.profile_sampler = sampler
+
+    @app.after_request
+    def finish_profiling(response):
+        sampler = _stop_sampler()
+        if sampler is None:
+            return response
+        total = (time.perf_counter() - g.profile_start) * 1000
+        metrics = [f"{name};dur={duration:.2f}" for name, duration in g.profile_phases.items()]
+        metrics.append(f"total;dur={total:.2f}")
+        response.headers["Server-Timing"] = ", ".join(metrics)
+        try:
+            path = _dump_stacks(sampler.stacks)
+            if path:
+                print(f"Debug: Wrote profile {path}")
+        except OSError as e:
+            print(f"Debug: Could not write profile: {e}")
+        return response
+
+    @app.teardown_request
+    def cleanup_profiling(exc):
+        # after_request is skipped on unhandled errors; never leave a sampler running
+        _stop_sampler()
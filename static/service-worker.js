@@ -1,22 +1,177 @@
+// The server prepends `self.PRECACHE_MANIFEST = {version, urls}` when this
+// script is served from /service-worker.js, so every deploy that changes the
+// precached files changes the script bytes and installs a new worker. Served
+// raw from /static/ there is no manifest: that copy is a kill switch that
+// replaces the legacy /static/-scoped worker, drops its caches and unregisters.
+const MANIFEST = self.PRECACHE_MANIFEST;
+const VERSION = MANIFEST ? MANIFEST.version : 'unversioned';
+const CACHE_PREFIX = 'windy-';
+const PRECACHE = `${CACHE_PREFIX}precache-${VERSION}`;
+const STATIC_CACHE = `${CACHE_PREFIX}static-${VERSION}`;
+const PAGE_CACHE = `${CACHE_PREFIX}pages-${VERSION}`;
+const API_CACHE = `${CACHE_PREFIX}api-${VERSION}`;
+const CURRENT_CACHES = [PRECACHE, STATIC_CACHE, PAGE_CACHE, API_CACHE];
+
+const NETWORK_TIMEOUT_MS = 4000;
+// Pages embed the live forecast too, so both are bounded: never serve forecasts older than 6h
+const API_MAX_AGE_MS = 6 * 60 * 60 * 1000;
+const PAGE_MAX_AGE_MS = 6 * 60 * 60 * 1000;
+const MAX_ENTRIES = { [STATIC_CACHE]: 60, [PAGE_CACHE]: 20, [API_CACHE]: 50 };
+const CACHED_AT_HEADER = 'X-SW-Cached-At';
+
+// Caches owned by a manifest-versioned worker, which the kill switch must leave alone
+const VERSIONED_CACHE = /^windy-(precache|static|pages|api)-[0-9a-f]{12}$/;
+
 self.addEventListener('install', event => {
-  self.skipWaiting();
+  if (!MANIFEST) {
+    self.skipWaiting();
+    return;
+  }
+  // Stamp precached entries like runtime ones so they expire instead of looking forever fresh
+  event.waitUntil(
+    Promise.all(MANIFEST.urls.map(url => {
+      const request = new Request(url, { cache: 'reload' });
+      return fetch(request).then(response => {
+        if (!response.ok) throw new Error(`Precache of ${url} failed: ${response.status}`);
+        return putWithTimestamp(PRECACHE, request, response);
+      });
+    })).then(() => self.skipWaiting())
+  );
 });
 
 self.addEventListener('activate', event => {
-  event.waitUntil(self.clients.claim());
+  if (!MANIFEST) {
+    event.waitUntil(retireLegacyWorker());
+    return;
+  }
+  event.waitUntil(
+    caches.keys()
+      .then(names => Promise.all(names
+        .filter(name => name.startsWith(CACHE_PREFIX) && !CURRENT_CACHES.includes(name))
+        .map(name => caches.delete(name))))
+      .then(() => self.clients.claim())
+  );
 });
 
 self.addEventListener('fetch', event => {
-  event.respondWith(
-    caches.open('windy-static-v1').then(cache => {
-      return cache.match(event.request).then(response => {
-        return response || fetch(event.request).then(networkResponse => {
-          if (event.request.method === 'GET' && networkResponse.ok && event.request.url.startsWith(self.location.origin)) {
-            cache.put(event.request, networkResponse.clone());
-          }
-          return networkResponse;
-        });
-      });
-    })
-  );
+  const request = event.request;
+  // Without respondWith the browser fetches from the network as usual
+  if (!MANIFEST || request.method !== 'GET') return;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin || url.pathname === '/service-worker.js') return;
+
+  if (url.pathname.startsWith('/api/')) {
+    event.respondWith(networkFirst(event, API_CACHE, API_MAX_AGE_MS));
+  } else if (request.mode === 'navigate') {
+    event.respondWith(networkFirst(event, PAGE_CACHE, PAGE_MAX_AGE_MS));
+  } else if (url.pathname.startsWith('/static/')) {
+    event.respondWith(cacheFirst(event, STATIC_CACHE));
+  }
 });
+
+// Kill switch: delete unversioned windy-* caches (e.g. windy-static-v1), unregister
+// this /static/ worker and reload the pages it controlled so they drop it
+async function retireLegacyWorker() {
+  const names = await caches.keys();
+  await Promise.all(names
+    .filter(name => name.startsWith(CACHE_PREFIX) && !VERSIONED_CACHE.test(name))
+    .map(name => caches.delete(name)));
+  await self.registration.unregister();
+  const clients = await self.clients.matchAll({ type: 'window' });
+  clients.forEach(client => client.navigate(client.url));
+}
+
+// Delete the oldest entries (cache keys keep insertion order) beyond the cap
+async function trimCache(cacheName) {
+  const cache = await caches.open(cacheName);
+  const keys = await cache.keys();
+  const excess = keys.length - (MAX_ENTRIES[cacheName] || Infinity);
+  for (let i = 0; i < excess; i++) {
+    await cache.delete(keys[i]);
+  }
+}
+
+// Store a copy stamped with the time it was fetched so fallbacks can report their age
+async function putWithTimestamp(cacheName, request, response) {
+  const headers = new Headers(response.headers);
+  headers.set(CACHED_AT_HEADER, Date.now().toString());
+  const body = await response.blob();
+  const cache = await caches.open(cacheName);
+  await cache.delete(request);
+  await cache.put(request, new Response(body, { status: response.status, statusText: response.statusText, headers }));
+  await trimCache(cacheName);
+}
+
+// Entries without a timestamp have unknown age and are treated as expired
+async function freshEntry(cacheName, request, maxAge) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(request);
+  if (!cached) return null;
+
+  const cachedAt = Number(cached.headers.get(CACHED_AT_HEADER));
+  const age = Date.now() - cachedAt;
+  if (!cachedAt || age > maxAge) {
+    await cache.delete(request);
+    return null;
+  }
+  return { cached, age };
+}
+
+async function cachedWithAge(cacheName, request, maxAge) {
+  const entry = await freshEntry(cacheName, request, maxAge) || await freshEntry(PRECACHE, request, maxAge);
+  if (!entry) return null;
+
+  const { cached, age } = entry;
+  const headers = new Headers(cached.headers);
+  headers.set('X-SW-Cache-Age', Math.round(age / 1000).toString());
+  const body = await cached.blob();
+  return new Response(body, { status: cached.status, statusText: cached.statusText, headers });
+}
+
+// Prefer fresh data; if the network is slow or down, fall back to a bounded-age cached copy
+function networkFirst(event, cacheName, maxAge) {
+  const request = event.request;
+  const network = fetch(request);
+  // Register the cache update now: once respondWith has settled (e.g. via the
+  // timeout fallback) the event no longer accepts waitUntil
+  event.waitUntil(network
+    .then(response => response.ok ? putWithTimestamp(cacheName, request, response.clone()) : null)
+    .catch(() => null));
+
+  return new Promise((resolve, reject) => {
+    let settled = false;
+    const fallback = () => cachedWithAge(cacheName, request, maxAge).then(cached => {
+      if (cached && !settled) {
+        settled = true;
+        resolve(cached);
+      }
+      return cached;
+    });
+    const timer = setTimeout(fallback, NETWORK_TIMEOUT_MS);
+
+    network.then(response => {
+      clearTimeout(timer);
+      if (!settled) {
+        settled = true;
+        resolve(response);
+      }
+    }).catch(error => {
+      clearTimeout(timer);
+      fallback().then(cached => {
+        if (!cached && !settled) reject(error);
+      });
+    });
+  });
+}
+
+async function cacheFirst(event, cacheName) {
+  const request = event.request;
+  const cached = await caches.match(request, { cacheName: PRECACHE }) || await caches.match(request, { cacheName });
+  if (cached) return cached;
+
+  const response = await fetch(request);
+  if (response.ok) {
+    event.waitUntil(putWithTimestamp(cacheName, request, response.clone()));
+  }
+  return response;
+}
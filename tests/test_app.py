@@ -0,0 +1,115 @@
+import json
+import math
+import os
+import re
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import app as portal
+
+
+@pytest.fixture
+def client():
+    return portal.app.test_client()
+
+
+def test_geocode_requires_query(client):
+    response = client.get('/api/geocode?q=%20')
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+def test_geocode_response_shape(client):
+    body = client.get('/api/geocode?q=pra').get_json()
+    assert body["status"] == "success"
+    assert body["query"] == "pra"
+    assert body["results"] == [{
+        "name": "Prague",
+        "country": "CZ",
+        "latitude": 50.088,
+        "longitude": 14.4208,
+        "population": 1357326
+    }]
+
+
+def test_geocode_clamps_limit(client):
+    assert len(client.get('/api/geocode?q=b&limit=0').get_json()["results"]) == 1
+    assert len(client.get('/api/geocode?q=b&limit=-5').get_json()["results"]) == 1
+    everything = client.get('/api/geocode?q=b&limit=1000').get_json()["results"]
+    assert len(everything) == len(portal.get_gazetteer().search("b", limit=50))
+
+
+def test_geocode_exact_flag(client):
+    assert client.get('/api/geocode?q=san&exact=1').get_json()["results"] == []
+    results = client.get('/api/geocode?q=santiago&exact=1').get_json()["results"]
+    assert [place["name"] for place in results] == ["Santiago"]
+
+
+@pytest.mark.parametrize("query", [
+    "",
+    "lat=50",
+    "lon=14",
+    "lat=abc&lon=14",
+    "lat=91&lon=14",
+    "lat=50&lon=-181",
+    "lat=nan&lon=14",
+    "lat=50&lon=nan",
+])
+def test_reverse_rejects_bad_coordinates(client, query):
+    response = client.get(f'/api/reverse?{query}')
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+def test_reverse_response_shape(client):
+    body = client.get('/api/reverse?lat=48.85&lon=2.35').get_json()
+    assert body["status"] == "success"
+    assert body["coordinates"] == {"latitude": 48.85, "longitude": 2.35}
+    place = body["place"]
+    assert (place["name"], place["country"]) == ("Paris", "FR")
+    assert set(place) == {"name", "country", "latitude", "longitude", "population", "distance_km"}
+    assert math.isclose(place["distance_km"], 0.8, abs_tol=0.1)
+
+
+def test_describe_location_labels_by_distance():
+    # Within 5 km: the bare place name
+    assert portal.describe_location(50.088, 14.4208) == "Prague, CZ"
+    # About 22 km north of Reykjavík, with no other bundled place nearby
+    assert portal.describe_location(64.35, -21.9426) == "Near Reykjavík, IS"
+    # Over 50 km from anything bundled
+    assert portal.describe_location(64.8, -21.9426) is None
+    assert portal.describe_location(0, -140) is None
+
+
+def test_service_worker_is_served_with_precache_manifest(client):
+    response = client.get('/service-worker.js')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/javascript'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    first_line, script = response.get_data(as_text=True).split('\n', 1)
+    assert first_line == f"self.PRECACHE_MANIFEST = {json.dumps(portal.build_precache_manifest())};"
+    assert "self.PRECACHE_MANIFEST" in script
+
+
+def test_precache_version_tracks_static_files(monkeypatch, tmp_path):
+    static_dir = tmp_path / 'static'
+    shutil.copytree(portal.STATIC_DIR, static_dir)
+    monkeypatch.setattr(portal, 'STATIC_DIR', str(static_dir))
+
+    monkeypatch.setattr(portal, '_precache_manifest', None)
+    before = portal.build_precache_manifest()
+    assert before["urls"] == portal.PRECACHE_URLS
+    assert re.fullmatch(r'[0-9a-f]{12}', before["version"])
+
+    monkeypatch.setattr(portal, '_precache_manifest', None)
+    assert portal.build_precache_manifest() == before
+
+    # An asset that is neither precached nor the worker itself still bumps the version
+    with open(static_dir / 'windy_map.html', 'a') as f:
+        f.write('<!-- changed -->\n')
+    monkeypatch.setattr(portal, '_precache_manifest', None)
+    assert portal.build_precache_manifest()["version"] != before["version"]
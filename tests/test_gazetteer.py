@@ -0,0 +1,84 @@
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from gazetteer import EARTH_RADIUS_KM, PLACES_PATH, get_gazetteer, normalize_name
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def all_places():
+    gazetteer = get_gazetteer()
+    return [gazetteer._record(i) for i in range(len(gazetteer))]
+
+
+def test_normalize_name_folds_case_accents_and_spaces():
+    assert normalize_name("Plzeň") == "plzen"
+    assert normalize_name("Łódź") == "lodz"
+    assert normalize_name("  Ústí   nad Labem ") == "usti nad labem"
+    assert normalize_name("São Paulo") == "sao paulo"
+
+
+def test_places_file_is_sorted_by_key():
+    with open(PLACES_PATH, 'rb') as f:
+        keys = [line.split(b'\t', 1)[0] for line in f]
+    assert keys
+    assert keys == sorted(keys)
+    for key in keys:
+        assert key.decode('utf-8') == normalize_name(key.decode('utf-8'))
+
+
+def test_search_matches_prefix():
+    results = get_gazetteer().search("pra")
+    assert [place["name"] for place in results] == ["Prague"]
+
+
+def test_search_is_accent_and_case_insensitive():
+    assert get_gazetteer().search("LODZ")[0]["name"] == "Łódź"
+    assert get_gazetteer().search("ústí")[0]["name"] == "Ústí nad Labem"
+
+
+def test_search_orders_by_population_and_respects_limit():
+    everything = get_gazetteer().search("b", limit=100)
+    populations = [place["population"] for place in everything]
+    assert populations == sorted(populations, reverse=True)
+    assert all(normalize_name(place["name"]).startswith("b") for place in everything)
+    assert get_gazetteer().search("b", limit=3) == everything[:3]
+
+
+def test_search_empty_or_unknown_query():
+    assert get_gazetteer().search("") == []
+    assert get_gazetteer().search("zzzz") == []
+
+
+def test_nearest_matches_brute_force():
+    places = all_places()
+    rng = random.Random(1234)
+    for _ in range(500):
+        lat = rng.uniform(-90, 90)
+        lon = rng.uniform(-180, 180)
+        expected = min(places, key=lambda p: haversine_km(lat, lon, p["latitude"], p["longitude"]))
+        found = get_gazetteer().nearest(lat, lon)
+        assert found["name"] == expected["name"]
+        assert math.isclose(found["distance_km"], haversine_km(lat, lon, expected["latitude"], expected["longitude"]), abs_tol=0.1)
+
+
+def test_search_exact_only_matches_whole_name():
+    assert get_gazetteer().search("san", exact=True) == []
+    assert get_gazetteer().search("port", exact=True) == []
+    assert [place["name"] for place in get_gazetteer().search("PORTO", exact=True)] == ["Porto"]
+    assert [place["name"] for place in get_gazetteer().search("Plzen", exact=True)] == ["Plzeň"]
+
+
+def test_search_ranks_every_prefix_match():
+    places = all_places()
+    expected = sorted((p for p in places if normalize_name(p["name"]).startswith("s")),
+                      key=lambda p: p["population"], reverse=True)
+    assert get_gazetteer().search("s", limit=5) == expected[:5]
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+
+import pytest
+from flask import Flask, g
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import profiling
+from profiling import init_profiling, phase
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+    app = Flask(__name__)
+    init_profiling(app)
+    app.samplers = []
+
+    @app.before_request
+    def remember_sampler():
+        sampler = g.get("profile_sampler")
+        if sampler is not None:
+            app.samplers.append(sampler)
+
+    @app.route('/work')
+    def work():
+        with phase("upstream"):
+            time.sleep(0.02)
+        with phase("render"):
+            pass
+        return "ok"
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError("boom")
+
+    return app
+
+
+def test_no_header_and_zero_rate_is_not_profiled(app):
+    response = app.test_client().get('/work')
+    assert "Server-Timing" not in response.headers
+    assert app.samplers == []
+
+
+def test_token_header_adds_server_timing(app, tmp_path):
+    response = app.test_client().get('/work', headers={"X-Profile": "s3cret"})
+    timing = response.headers["Server-Timing"]
+    metrics = [metric.split(";")[0] for metric in timing.split(", ")]
+    assert metrics == ["upstream", "render", "total"]
+    assert "total;dur=" in timing
+    assert not app.samplers[0].is_alive()
+    folded = list(tmp_path.glob("*.folded"))
+    assert len(folded) == 1
+    stack, count = folded[0].read_text().splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+
+def test_wrong_or_non_ascii_token_is_not_profiled(app):
+    client = app.test_client()
+    for token in ["wrong", "café"]:
+        response = client.get('/work', headers={"X-Profile": token})
+        assert response.status_code == 200
+        assert "Server-Timing" not in response.headers
+
+
+def test_sample_rate_profiles_without_header(app, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    response = app.test_client().get('/work')
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+
+def test_sampler_stopped_on_unhandled_error(app):
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    response = app.test_client().get('/boom', headers={"X-Profile": "s3cret"})
+    assert response.status_code == 500
+    assert len(app.samplers) == 1
+    assert not app.samplers[0].is_alive()
+
+
+def test_phase_is_noop_outside_profiled_request():
+    with phase("upstream"):
+        pass
+
+
+def test_profile_files_are_unique_and_capped(app, monkeypatch, tmp_path):
+    client = app.test_client()
+    for _ in range(2):
+        client.get('/work', headers={"X-Profile": "s3cret"})
+    assert len(list(tmp_path.glob("*.folded"))) == 2
+
+    monkeypatch.setattr(profiling, "PROFILE_MAX_FILES", 3)
+    for _ in range(3):
+        client.get('/work', headers={"X-Profile": "s3cret"})
+    assert len(list(tmp_path.glob("*.folded"))) == 3